@@ -1,16 +1,93 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional, Union
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Union
+import inspect
+import json
+import os
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def _serialize_tools(config: Dict[str, Any]) -> bytes:
+    # handlers are local callables, only the schema part of each tool is serialized
+    return _dumps([{k: v for k, v in tool.items() if k != "handler"} for tool in config.get("tools", [])])
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+def _compile_validator(tool_name: str,
+                       schema: Dict[str, Any],
+                       trusted: bool = True) -> Optional[Callable[[Dict[str, Any]], None]]:
+    """
+    Compile a tool input schema into a validator that raises ValueError on invalid input.
+    fastjsonschema generates and executes Python code for the schema, so it is only used
+    for trusted schemas; untrusted ones and schemas it cannot compile are interpreted by
+    jsonschema. Returns None if no suitable library is available.
+    """
+    if trusted and fastjsonschema is not None:
+        try:
+            compiled = fastjsonschema.compile(schema)
+        except fastjsonschema.JsonSchemaDefinitionException:
+            compiled = None
+        if compiled is not None:
+            def validate(tool_input: Dict[str, Any]) -> None:
+                try:
+                    compiled(tool_input)
+                except fastjsonschema.JsonSchemaValueException as e:
+                    raise ValueError(f"Invalid input for tool '{tool_name}': {e.message}") from e
+            return validate
+    
+    try:
+        # imported here as it is slow to load
+        import jsonschema
+    except ImportError:
+        jsonschema = None
+    if jsonschema is not None:
+        validator = jsonschema.Draft202012Validator(schema)
+        def validate(tool_input: Dict[str, Any]) -> None:
+            try:
+                validator.validate(tool_input)
+            except jsonschema.ValidationError as e:
+                raise ValueError(f"Invalid input for tool '{tool_name}': {e.message}") from e
+        return validate
+    
+    return None
+
+# number of distinct texts whose token counts are kept per agent
+TOKEN_CACHE_SIZE = 4096
+# chat formatting tokens added per message (role and delimiters) on top of its content
+MESSAGE_TOKEN_OVERHEAD = 4
+# on-disk cache shared across runs, entries expire after DISK_CACHE_EXPIRE seconds
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/mcpclient/agent")
+DISK_CACHE_EXPIRE = 7 * 24 * 3600
+# shorter texts tokenize faster than a disk lookup, their counts are only kept in memory
+DISK_CACHE_MIN_CHARS = 2048
 
 class Agent(ABC):
     """
     Base class for AI model agents with support for multiple MCP servers.
     This class serves as a swappable LLM instance for client classes.
     """
+    # model identifier used to namespace persistent caches, set by subclasses
+    model_name: str = ""
     
     def __init__(self, 
                  name,
                  instructions,
                  mcp_servers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
                  **kwargs):
         """
         Initialize the agent.
@@ -22,6 +99,7 @@ class Agent(ABC):
         Args:
             name: The name of the agent
             mcp_servers: Dictionary of MCP server configurations {server_name: config_dict}
+            cache_dir: Directory of the persistent token/response cache, None disables it
             **kwargs: Additional model-specific configuration parameters
         """
         self.name = name
@@ -29,16 +107,30 @@ class Agent(ABC):
         # Initialize MCP server configurations
         self.mcp_servers = mcp_servers or {}
         self.active_mcp_server = next(iter(self.mcp_servers)) if self.mcp_servers else None
+        self._refresh_server_names()
+        # tool input validators and handlers keyed by (server_name, tool_name), built once per server config
+        self._validators: Dict[tuple[str, str], Callable[[Dict[str, Any]], None]] = {}
+        self._tool_dispatch: Dict[tuple[str, str], Callable[..., Union[Any, Awaitable[Any]]]] = {}
+        for server_name, config in self.mcp_servers.items():
+            self._register_tools(server_name, config)
         self.config = kwargs
+        # LRU of token counts keyed by a digest of the counted text
+        self._token_cache: OrderedDict[bytes, int] = OrderedDict()
+        # persistent cache backing the in-memory ones across runs
+        self._disk_cache = diskcache.Cache(cache_dir) if diskcache is not None and cache_dir else None
+        # serialized tool schemas per server, rebuilt only when a server config changes
+        self._tool_json_cache: Dict[str, bytes] = {
+            server_name: _serialize_tools(config) for server_name, config in self.mcp_servers.items()
+        }
     
     @abstractmethod
-    def query(self, 
-              messages: List[Dict[str, str]], 
-              temperature: float = 0.7,
-              max_tokens: Optional[int] = None,
-              stream: bool = False,
-              tools: Optional[List[Dict[str, Any]]] = None,
-              **kwargs) -> Union[str, Dict[str, Any], Any]:
+    async def query(self, 
+                    messages: List[Dict[str, str]], 
+                    temperature: float = 0.7,
+                    max_tokens: Optional[int] = None,
+                    stream: bool = False,
+                    tools: Optional[List[Dict[str, Any]]] = None,
+                    **kwargs) -> Union[str, Dict[str, Any], Any]:
         """
         Query the model with messages and return the response.
         
@@ -51,11 +143,62 @@ class Agent(ABC):
             **kwargs: Additional model-specific parameters
             
         Returns:
-            The model's response
+            The model's response, or an async iterator of text chunks when stream is True
         """
         pass
     
     @abstractmethod
+    def _count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """
+        Tokenize the given texts with the model's tokenizer.
+        Subclasses implement this; callers should use get_token_counts which caches results.
+        
+        Args:
+            texts: The texts to count tokens for
+            
+        Returns:
+            The number of tokens of each text, in order
+        """
+        pass
+    
+    def get_token_counts(self, texts: List[str]) -> List[int]:
+        """
+        Count the number of tokens in each of the given texts.
+        Counts are cached by content hash so repeated instructions, tool schemas
+        and history messages are only tokenized once, in memory and across runs
+        on disk for long texts; the remaining texts are tokenized in a single batch.
+        
+        Args:
+            texts: The texts to count tokens for
+            
+        Returns:
+            The number of tokens of each text, in order
+        """
+        keys = [blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts]
+        counts: List[Optional[int]] = []
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            count = self._token_cache.get(key)
+            if count is None and len(text) >= DISK_CACHE_MIN_CHARS:
+                count = self._disk_get("tokens", key)
+                if count is not None:
+                    self._token_cache[key] = count
+            elif count is not None:
+                self._token_cache.move_to_end(key)
+            if count is None:
+                missing[key] = text
+            counts.append(count)
+        
+        if missing:
+            computed = dict(zip(missing, self._count_tokens_batch(list(missing.values()))))
+            self._token_cache.update(computed)
+            self._disk_set_many("tokens", {key: computed[key] for key, text in missing.items() if len(text) >= DISK_CACHE_MIN_CHARS})
+            counts = [computed[key] if count is None else count for key, count in zip(keys, counts)]
+        # disk hits are inserted too, so evict even when nothing was tokenized
+        while len(self._token_cache) > TOKEN_CACHE_SIZE:
+            self._token_cache.popitem(last=False)
+        return counts
+    
     def get_token_count(self, text: str) -> int:
         """
         Count the number of tokens in the given text.
@@ -66,9 +209,108 @@ class Agent(ABC):
         Returns:
             The number of tokens
         """
-        pass
+        return self.get_token_counts([text])[0]
+    
+    def get_messages_token_count(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Count the number of tokens in a list of messages.
+        Each message is counted independently, so appending a turn to a history
+        only tokenizes the new message. Includes MESSAGE_TOKEN_OVERHEAD per message.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            
+        Returns:
+            The total number of tokens
+        """
+        counts = self.get_token_counts([message.get("content") or "" for message in messages])
+        return sum(counts) + MESSAGE_TOKEN_OVERHEAD * len(counts)
+    
+    def _disk_get(self, namespace: str, key: bytes) -> Any:
+        if self._disk_cache is None:
+            return None
+        return self._disk_cache.get((namespace, self.model_name, key))
+    
+    def _disk_set(self, namespace: str, key: bytes, value: Any) -> None:
+        if self._disk_cache is not None:
+            self._disk_cache.set((namespace, self.model_name, key), value, expire=DISK_CACHE_EXPIRE)
+    
+    def _disk_set_many(self, namespace: str, items: Dict[bytes, Any]) -> None:
+        # one transaction for the whole batch instead of one commit per entry
+        if self._disk_cache is not None and items:
+            with self._disk_cache.transact():
+                for key, value in items.items():
+                    self._disk_cache.set((namespace, self.model_name, key), value, expire=DISK_CACHE_EXPIRE)
+    
+    def _system_prefix_token_count(self) -> int:
+        """
+        Number of tokens the model sends ahead of the messages on every request.
+        Counted on demand, so it follows configuration changes and constructing
+        an agent does not load the tokenizer; repeated calls hit the token cache.
+        """
+        return self.get_token_count(self.instructions)
+    
+    def trim_messages(self, 
+                      messages: List[Dict[str, str]], 
+                      budget: int,
+                      reserve: int = 0) -> List[Dict[str, str]]:
+        """
+        Drop the oldest turns so the messages fit in the context window.
+        Leading system messages and the newest message are always kept.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            budget: Context window size in tokens
+            reserve: Tokens to keep free, e.g. for the response
+            
+        Returns:
+            The system messages followed by the longest suffix of the remaining
+            turns that fits in the budget
+        """
+        start = 0
+        while start < len(messages) and messages[start].get("role") == "system":
+            start += 1
+        system, history = messages[:start], messages[start:]
+        
+        remaining = budget - reserve - self._system_prefix_token_count() - self.get_messages_token_count(system)
+        counts = self.get_token_counts([message.get("content") or "" for message in history])
+        keep = 0
+        for count in reversed(counts):
+            remaining -= count + MESSAGE_TOKEN_OVERHEAD
+            if remaining < 0 and keep > 0:
+                break
+            keep += 1
+        
+        if keep == len(history):
+            return messages
+        return system + history[len(history) - keep:]
     
     # MCP Server Management
+    def _refresh_server_names(self) -> None:
+        # immutable snapshots of the server names, rebuilt only when servers change
+        self._server_names_tuple: tuple[str, ...] = tuple(self.mcp_servers)
+        self._server_name_set: frozenset[str] = frozenset(self._server_names_tuple)
+    
+    def _unregister_tools(self, server_name: str) -> None:
+        self._validators = {key: validator for key, validator in self._validators.items() if key[0] != server_name}
+        self._tool_dispatch = {key: handler for key, handler in self._tool_dispatch.items() if key[0] != server_name}
+    
+    def _register_tools(self, server_name: str, config: Dict[str, Any]) -> None:
+        self._unregister_tools(server_name)
+        for tool in config.get("tools", []):
+            key = (server_name, tool["name"])
+            # input_schema is written locally, inputSchema is passed through as sent by the MCP server
+            schema = tool.get("input_schema")
+            trusted = schema is not None
+            if not trusted:
+                schema = tool.get("inputSchema")
+            if schema:
+                validator = _compile_validator(tool["name"], schema, trusted)
+                if validator is not None:
+                    self._validators[key] = validator
+            if tool.get("handler") is not None:
+                self._tool_dispatch[key] = tool["handler"]
+    
     def add_mcp_server(self, server_name: str, config: Dict[str, Any]) -> None:
         """
         Add or update an MCP server configuration.
@@ -77,7 +319,12 @@ class Agent(ABC):
             server_name: Unique identifier for the MCP server
             config: Configuration dictionary for the server
         """
+        is_new = server_name not in self._server_name_set
         self.mcp_servers[server_name] = config
+        if is_new:
+            self._refresh_server_names()
+        self._tool_json_cache[server_name] = _serialize_tools(config)
+        self._register_tools(server_name, config)
         if self.active_mcp_server is None:
             self.active_mcp_server = server_name
     
@@ -93,6 +340,9 @@ class Agent(ABC):
         """
         if server_name in self.mcp_servers:
             self.mcp_servers.pop(server_name)
+            self._tool_json_cache.pop(server_name, None)
+            self._unregister_tools(server_name)
+            self._refresh_server_names()
             # Update active server if the removed one was active
             if self.active_mcp_server == server_name:
                 self.active_mcp_server = next(iter(self.mcp_servers)) if self.mcp_servers else None
@@ -111,6 +361,8 @@ class Agent(ABC):
         """
         if server_name in self.mcp_servers:
             self.active_mcp_server = server_name
+            if server_name not in self._tool_json_cache:
+                self._tool_json_cache[server_name] = _serialize_tools(self.mcp_servers[server_name])
             return True
         return False
     
@@ -124,12 +376,13 @@ class Agent(ABC):
         return self.mcp_servers
     
     # MCP Tool Execution
-    def execute_tool(self, 
-                     tool_name: str, 
-                     tool_input: Dict[str, Any],
-                     server_name: Optional[str] = None) -> Any:
+    async def execute_tool(self, 
+                           tool_name: str, 
+                           tool_input: Dict[str, Any],
+                           server_name: Optional[str] = None) -> Any:
         """
         Execute a tool with the given input on the specified or active MCP server.
+        Tools are dispatched to the 'handler' callable of their config entry.
         
         Args:
             tool_name: The name of the tool to execute
@@ -140,19 +393,29 @@ class Agent(ABC):
             The tool's response
             
         Raises:
-            ValueError: If server_name is invalid or no active server exists
-            NotImplementedError: If tool execution is not implemented by subclass
+            ValueError: If server_name is invalid, no active server exists or tool_input
+                does not match the tool's input schema
+            NotImplementedError: If no handler is registered for the tool
         """
         target_server = server_name or self.active_mcp_server
         
         if not target_server:
             raise ValueError("No MCP server specified and no active server configured")
         
-        if target_server not in self.mcp_servers:
+        if target_server not in self._server_name_set:
             raise ValueError(f"MCP server '{target_server}' not found")
         
-        # Implementation to be provided by subclasses
-        raise NotImplementedError("Tool execution must be implemented by subclasses")
+        validator = self._validators.get((target_server, tool_name))
+        if validator is not None:
+            validator(tool_input)
+        
+        handler = self._tool_dispatch.get((target_server, tool_name))
+        if handler is None:
+            raise NotImplementedError(f"No handler registered for tool '{tool_name}' on MCP server '{target_server}'")
+        result = handler(**tool_input)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
     
     def get_available_tools(self, server_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -172,12 +435,36 @@ class Agent(ABC):
         if not target_server:
             raise ValueError("No MCP server specified and no active server configured")
         
-        if target_server not in self.mcp_servers:
+        if target_server not in self._server_name_set:
             raise ValueError(f"MCP server '{target_server}' not found")
         
         # Implementation to be provided by subclasses
         raise NotImplementedError("Getting available tools must be implemented by subclasses")
     
+    def get_available_tools_bytes(self, server_name: Optional[str] = None) -> bytes:
+        """
+        Get the serialized tool schemas of the specified or active MCP server.
+        The JSON is computed when the server is registered, so this is a lookup.
+        
+        Args:
+            server_name: The server to query (uses active server if None)
+            
+        Returns:
+            JSON encoded list of tool schemas
+            
+        Raises:
+            ValueError: If server_name is invalid or no active server exists
+        """
+        target_server = server_name or self.active_mcp_server
+        
+        if not target_server:
+            raise ValueError("No MCP server specified and no active server configured")
+        
+        if target_server not in self._tool_json_cache:
+            raise ValueError(f"MCP server '{target_server}' not found")
+        
+        return self._tool_json_cache[target_server]
+    
     def get_agent_info(self) -> Dict[str, Any]:
         """
         Get information about the current model.
@@ -189,8 +476,8 @@ class Agent(ABC):
             "name": self.name,
             "provider": self.__class__.__name__.replace("Agent", ""),
             "active_mcp_server": self.active_mcp_server,
-            "mcp_servers": list(self.mcp_servers.keys())
+            "mcp_servers": self._server_names_tuple
         }
     
     def __repr__(self) -> str:
-        return f"{self.__class__.__name__}(model={self.name}, mcp_servers={list(self.mcp_servers.keys())})"
\ No newline at end of file
+        return f"{self.__class__.__name__}(model={self.name}, mcp_servers=[{', '.join(self._server_names_tuple)}])"
\ No newline at end of file
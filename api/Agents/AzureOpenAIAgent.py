@@ -1,31 +1,148 @@
-from agents import Agent as OpenAIAgent, Runner, set_tracing_disabled, function_tool, OpenAIChatCompletionsModel
-from openai import AsyncAzureOpenAI
-import dotenv
+import asyncio
+import atexit
+import functools
+import json
+import logging
 import os
+from hashlib import sha256
 from Agent import Agent
-from typing import Dict, Any, Optional
-dotenv.load_dotenv()
-BASE_URL = os.getenv("AZURE_OPENAI_API_BASE")
-API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
-MODEL_NAME = os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
-
-if not BASE_URL or not API_KEY:
-    raise ValueError("Azure OpenAI API base URL and API key must be set in environment variables.")
-client = AsyncAzureOpenAI(
-            azure_endpoint=BASE_URL,
-            api_key= API_KEY,
-            api_version=API_VERSION,
-        )
-# disable tracing for this agent as we don't have OpenAI tracing key
-set_tracing_disabled(disabled=True)
+from RateLimiter import RateLimiter
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Any, Optional, Union
+
+# the agents SDK, openai, httpx, tiktoken and tenacity are imported on first use to keep module import cheap;
+# SemanticCache pulls in numpy and is only imported by callers that pass a cache
+if TYPE_CHECKING:
+    from SemanticCache import SemanticCache
+    import httpx
+    import tiktoken
+    from agents import FunctionTool, Model, RunConfig, RunResult, RunResultStreaming
+    from openai import AsyncAzureOpenAI
+
+logger = logging.getLogger(__name__)
+# concurrent embedding lookups are coalesced into one request of up to this many inputs,
+# waiting at most EMBEDDING_BATCH_DELAY seconds for a batch to fill
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_BATCH_DELAY = 0.005
+# fewer texts than this are tokenized inline, starting the batch thread pool costs more
+ENCODE_BATCH_MIN_TEXTS = 8
+
+@functools.cache
+def _ensure_env() -> None:
+    import dotenv
+    dotenv.load_dotenv()
+
+@functools.lru_cache(maxsize=None)
+def _getenv(key: str, default: Optional[str] = None) -> Optional[str]:
+    _ensure_env()
+    return os.getenv(key, default)
+
+@functools.cache
+def _get_sdk():
+    import agents
+    # disable tracing for this agent as we don't have OpenAI tracing key
+    agents.set_tracing_disabled(disabled=True)
+    return agents
+
+# one pooled transport shared by every agent so concurrent queries reuse warm TCP/TLS connections
+http_client: Optional["httpx.AsyncClient"] = None
+
+@functools.cache
+def _get_client() -> "AsyncAzureOpenAI":
+    global http_client
+    import httpx
+    from openai import AsyncAzureOpenAI
+    base_url = _getenv("AZURE_OPENAI_API_BASE")
+    api_key = _getenv("AZURE_OPENAI_API_KEY")
+    if not base_url or not api_key:
+        raise ValueError("Azure OpenAI API base URL and API key must be set in environment variables.")
+    http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+    atexit.register(_close_http_client_at_exit)
+    return AsyncAzureOpenAI(
+            azure_endpoint=base_url,
+            api_key=api_key,
+            api_version=_getenv("AZURE_OPENAI_API_VERSION", "2023-05-15"),
+            http_client=http_client,
+        )
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP transport. Call this before the event loop shuts down.
+    """
+    if http_client is not None:
+        await http_client.aclose()
+
+def _close_http_client_at_exit() -> None:
+    if http_client is None or http_client.is_closed:
+        return
+    try:
+        asyncio.run(close_http_client())
+    except RuntimeError:
+        # connections bound to an already closed loop are dropped with the process
+        pass
+
+@functools.cache
+def _get_rate_limiter() -> Optional[RateLimiter]:
+    # shared by every agent since they all draw from the same deployment quota,
+    # AZURE_OPENAI_TPM_LIMIT=0 disables client-side rate limiting
+    tpm_limit = int(_getenv("AZURE_OPENAI_TPM_LIMIT", "0"))
+    return RateLimiter(tpm_limit) if tpm_limit else None
+
+def _is_retryable(error: BaseException) -> bool:
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+    # the same failures the openai client retries on its own: connection errors and
+    # timeouts, 408 request timeout, 409 lock conflicts, 429 and 5xx
+    if isinstance(error, (APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code in (408, 409, 429) or error.status_code >= 500)
+
+@functools.cache
+def _backoff():
+    from tenacity import wait_exponential_jitter
+    return wait_exponential_jitter(initial=1, max=30)
+
+def _wait_retry_after(retry_state) -> float:
+    from openai import APIStatusError
+    # honour the server's Retry-After when it sends one, otherwise back off with jitter
+    error = retry_state.outcome.exception()
+    if isinstance(error, APIStatusError):
+        try:
+            return min(float(error.response.headers.get("retry-after")), 60.0)
+        except (TypeError, ValueError):
+            pass
+    return _backoff()(retry_state)
+
+@functools.cache
+def _get_retrying():
+    from tenacity import AsyncRetrying, before_sleep_log, retry_if_exception, stop_after_attempt
+    return AsyncRetrying(
+        retry=retry_if_exception(_is_retryable),
+        wait=_wait_retry_after,
+        stop=stop_after_attempt(6),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model_name: str) -> "tiktoken.Encoding":
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # deployment names need not match a known model, fall back to the gpt-4o encoding
+        return tiktoken.get_encoding("o200k_base")
 
 class AzureOpenAIAgent(Agent):
     def __init__(self,
                 name,
                 instructions,
                 mcp_servers: Optional[Dict[str, Dict[str, Any]]] = None,
-                client: AsyncAzureOpenAI = client,
+                client: Optional["AsyncAzureOpenAI"] = None,
+                cache: Optional["SemanticCache"] = None,
+                rate_limiter: Optional[RateLimiter] = None,
                 **kwargs):
             """
             Initialize the Azure OpenAI agent.
@@ -35,15 +152,473 @@ class AzureOpenAIAgent(Agent):
             Args:
                 name: The name of the agent
                 mcp_servers: Dictionary of MCP server configurations {server_name: config_dict}
+                client: Azure OpenAI client, defaults to the shared pooled client
+                cache: Optional response cache consulted before each query, persisted to disk with the token cache
+                rate_limiter: Token bucket applied before each request, defaults to one sized by AZURE_OPENAI_TPM_LIMIT
                 **kwargs: Additional model-specific configuration parameters
             """
+            self.model_name = _getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
+            # context window of the deployed model, query history is trimmed to fit
+            self.context_window = int(_getenv("AZURE_OPENAI_CONTEXT_WINDOW", "128000"))
+            # tokens kept free for the completion when a query does not set max_tokens
+            self.response_reserve = int(_getenv("AZURE_OPENAI_RESPONSE_RESERVE", "4096"))
+            self.embedding_model_name = _getenv("AZURE_OPENAI_EMBEDDING_MODEL_NAME", "text-embedding-3-small")
             super().__init__(name=name, instructions=instructions,mcp_servers=mcp_servers, **kwargs)
-            self.client = client
-            self.agent = OpenAIAgent(
+            sdk = _get_sdk()
+            self.client = client or _get_client()
+            self.cache = cache
+            self.rate_limiter = rate_limiter or _get_rate_limiter()
+            self._embedding_queue: Optional[asyncio.Queue] = None
+            self._embedding_task: Optional[asyncio.Task] = None
+            self._usage = {"prompt": 0, "cached": 0, "completion": 0}
+            # query retries through _get_retrying, so the model it runs skips the client's own
+            # retries; streams cannot be replayed and keep the client's retries on connect
+            self.agent = sdk.Agent(
                  name=name,
                  instructions=instructions,
-                 model=OpenAIChatCompletionsModel(model=MODEL_NAME, openai_client=client)
+                 model=sdk.OpenAIChatCompletionsModel(model=self.model_name, openai_client=self.client.with_options(max_retries=0))
                  )
-            
-                 
-            
+            self._stream_model = sdk.OpenAIChatCompletionsModel(model=self.model_name, openai_client=self.client)
+            self._agent_tools_json = ""
+            self._agent_tools_dirty = True
+
+    def _unregister_tools(self, server_name: str) -> None:
+        super()._unregister_tools(server_name)
+        # every server change passes through here, the SDK tools are rebuilt before the next run
+        self._agent_tools_dirty = True
+
+    def _function_tool(self, server_name: str, tool: Dict[str, Any]) -> "FunctionTool":
+        tool_name = tool["name"]
+
+        async def invoke(context, arguments: str) -> Any:
+            try:
+                return await self.execute_tool(tool_name, json.loads(arguments or "{}"), server_name)
+            except (ValueError, json.JSONDecodeError) as e:
+                # invalid arguments are reported back so the model can correct the call
+                return f"Error: {e}"
+
+        return _get_sdk().FunctionTool(
+            name=tool_name,
+            description=tool.get("description", ""),
+            params_json_schema=tool.get("input_schema") or tool.get("inputSchema") or {"type": "object", "properties": {}},
+            on_invoke_tool=invoke,
+            # MCP schemas are not written for strict mode
+            strict_json_schema=False,
+        )
+
+    def _sync_agent_tools(self) -> None:
+        """
+        Expose every tool with a registered handler to the model, dispatched through
+        execute_tool. If servers share a tool name, the first server registered wins.
+        """
+        if not self._agent_tools_dirty:
+            return
+        tools = {}
+        for server_name in self._server_names_tuple:
+            for tool in self.mcp_servers[server_name].get("tools", []):
+                if (server_name, tool["name"]) in self._tool_dispatch and tool["name"] not in tools:
+                    tools[tool["name"]] = self._function_tool(server_name, tool)
+        self.agent.tools = list(tools.values())
+        self._agent_tools_json = json.dumps(
+            [{"name": t.name, "description": t.description, "parameters": t.params_json_schema} for t in self.agent.tools]
+        ) if tools else ""
+        self._agent_tools_dirty = False
+
+    def _system_prefix_token_count(self) -> int:
+        # the tool schemas are sent ahead of the messages along with the instructions
+        self._sync_agent_tools()
+        prefix = super()._system_prefix_token_count()
+        return prefix + self.get_token_count(self._agent_tools_json) if self._agent_tools_json else prefix
+
+    def _count_tokens_batch(self, texts: List[str]) -> List[int]:
+        # ordinary encoding treats special tokens such as <|endoftext|> as plain text instead of raising
+        encoding = _get_encoding(self.model_name)
+        if len(texts) < ENCODE_BATCH_MIN_TEXTS:
+            return [len(encoding.encode_ordinary(text)) for text in texts]
+        # the batch call releases the GIL and tokenizes across a thread pool created per call
+        encoded = encoding.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)
+        return [len(tokens) for tokens in encoded]
+
+    def _run_config(self, temperature: float, max_tokens: Optional[int], model: Optional["Model"] = None) -> "RunConfig":
+        sdk = _get_sdk()
+        return sdk.RunConfig(
+            model=model,
+            model_settings=sdk.ModelSettings(temperature=temperature, max_tokens=max_tokens)
+        )
+
+    def _delta_messages(self, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> List[Dict[str, str]]:
+        """
+        Prepare messages for dispatch: drop a leading system message that repeats
+        the agent instructions, the SDK already sends them as the system prefix,
+        and trim the oldest turns to fit the context window.
+        """
+        if messages and messages[0].get("role") == "system" and messages[0].get("content") == self.instructions:
+            messages = messages[1:]
+        return self.trim_messages(messages, self.context_window, reserve=max_tokens or self.response_reserve)
+
+    async def _acquire_rate_limit(self, messages: List[Dict[str, str]], max_tokens: Optional[int]) -> None:
+        if self.rate_limiter is not None:
+            estimate = self._system_prefix_token_count() + self.get_messages_token_count(messages) + (max_tokens or self.response_reserve)
+            await self.rate_limiter.acquire(estimate)
+
+    async def _run_once(self,
+                        messages: List[Dict[str, str]],
+                        run_config: "RunConfig",
+                        max_tokens: Optional[int],
+                        **kwargs) -> "RunResult":
+        await self._acquire_rate_limit(messages, max_tokens)
+        self._sync_agent_tools()
+        return await _get_sdk().Runner.run(self.agent, input=messages, run_config=run_config, **kwargs)
+
+    async def _run(self, *args, **kwargs) -> "RunResult":
+        # rate limited and retried on transient errors so one throttled request does not fail a query_many batch
+        return await _get_retrying().wraps(self._run_once)(*args, **kwargs)
+
+    def _cache_context(self, temperature: float, max_tokens: Optional[int], kwargs: Dict[str, Any]) -> bytes:
+        """
+        Digest of everything besides the messages that shapes a response, used to scope
+        cached responses to this agent's instructions, tools and generation settings.
+        """
+        settings = json.dumps({
+            "model": self.model_name,
+            "instructions": self.instructions,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "kwargs": kwargs,
+        }, sort_keys=True, default=str).encode("utf-8")
+        tools = b"".join(self._tool_json_cache[server] for server in sorted(self._tool_json_cache))
+        return sha256(settings + tools).digest()
+
+    async def query(self,
+                    messages: List[Dict[str, str]],
+                    temperature: float = 0.7,
+                    max_tokens: Optional[int] = None,
+                    stream: bool = False,
+                    tools: Optional[List[Dict[str, Any]]] = None,
+                    **kwargs) -> Union[str, AsyncIterator[str], Dict[str, Any], Any]:
+        """
+        Run the agent on the given messages and return its final output.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            temperature: Controls randomness (0 = deterministic, 1 = creative)
+            max_tokens: Maximum tokens in the response
+            stream: Whether to stream the response
+            tools: Not supported, the model is given every tool with a handler registered
+                through the agent's MCP server configurations
+            **kwargs: Additional parameters passed to Runner.run
+
+        Returns:
+            The agent's final output, or an async iterator of text chunks when stream is True
+        """
+        if tools is not None:
+            raise NotImplementedError("Per-query tools are not supported, register them with add_mcp_server")
+        if stream:
+            return self.query_stream(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+
+        if self.cache is not None:
+            context = self._cache_context(temperature, max_tokens, kwargs)
+            key = self.cache.key(messages, context)
+            prompt_tokens = self.get_messages_token_count(messages)
+            response = self.cache.get_exact(key, prompt_tokens)
+            if response is None:
+                response = self._disk_get("response", key)
+                if response is not None:
+                    self.cache.put(key, None, response)
+                    response = self.cache.get_exact(key, prompt_tokens)
+            if response is not None:
+                return response
+            text = self.cache.last_user_turn(messages)
+            embedding = None
+            if text:
+                try:
+                    embedding = await self._embed(text)
+                except Exception:
+                    # a failed cache lookup must not fail the query itself
+                    logger.warning("Semantic cache lookup failed, querying the model", exc_info=True)
+            semantic_context = self.cache.semantic_context(messages, context)
+            response = self.cache.get_semantic(embedding, prompt_tokens, semantic_context)
+            if response is not None:
+                return response
+
+        result = await self._run(
+            self._delta_messages(messages, max_tokens),
+            self._run_config(temperature, max_tokens),
+            max_tokens,
+            **kwargs,
+        )
+        self._record_usage(result)
+
+        if self.cache is not None:
+            self.cache.put(key, embedding, result.final_output, semantic_context)
+            self._disk_set("response", key, result.final_output)
+        return result.final_output
+
+    async def query_stream(self,
+                           messages: List[Dict[str, str]],
+                           temperature: float = 0.7,
+                           max_tokens: Optional[int] = None,
+                           **kwargs) -> AsyncIterator[str]:
+        """
+        Run the agent on the given messages and yield text chunks as they are generated.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            temperature: Controls randomness (0 = deterministic, 1 = creative)
+            max_tokens: Maximum tokens in the response
+            **kwargs: Additional parameters passed to Runner.run_streamed
+
+        Yields:
+            Text deltas of the agent's output
+        """
+        messages = self._delta_messages(messages, max_tokens)
+        await self._acquire_rate_limit(messages, max_tokens)
+        self._sync_agent_tools()
+        from openai.types.responses import ResponseTextDeltaEvent
+        result = _get_sdk().Runner.run_streamed(
+            self.agent,
+            input=messages,
+            run_config=self._run_config(temperature, max_tokens, self._stream_model),
+            **kwargs,
+        )
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                yield event.data.delta
+        self._record_usage(result)
+
+    async def query_collect(self,
+                            messages: List[Dict[str, str]],
+                            **kwargs) -> str:
+        """
+        Stream a query and join the chunks into a single string.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            **kwargs: Additional parameters passed to query_stream
+
+        Returns:
+            The complete text output
+        """
+        return "".join([chunk async for chunk in self.query_stream(messages, **kwargs)])
+
+    async def _embed(self, text: str) -> List[float]:
+        # the batcher is bound to the running loop, restart it if the agent moved to a new one
+        task = self._embedding_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            self._embedding_queue = asyncio.Queue()
+            # the batcher only gets the client and model, so it does not keep the agent alive
+            self._embedding_task = asyncio.create_task(
+                self._embedding_batcher(self._embedding_queue, self.client, self.embedding_model_name)
+            )
+        future = asyncio.get_running_loop().create_future()
+        await self._embedding_queue.put((text, future))
+        return await future
+
+    @staticmethod
+    async def _embedding_batcher(queue: asyncio.Queue, client: "AsyncAzureOpenAI", model: str) -> None:
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await queue.get()]
+                deadline = loop.time() + EMBEDDING_BATCH_DELAY
+                while len(batch) < EMBEDDING_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                try:
+                    response = await client.embeddings.create(model=model, input=[text for text, _ in batch])
+                except Exception as e:
+                    if len(batch) > 1:
+                        # one bad input fails the whole request, retry each input on its own
+                        # so only the offending ones fail
+                        await asyncio.gather(*[
+                            AzureOpenAIAgent._embed_one(client, model, text, future) for text, future in batch
+                        ])
+                    elif not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    continue
+                for (_, future), item in zip(batch, sorted(response.data, key=lambda d: d.index)):
+                    if not future.done():
+                        future.set_result(item.embedding)
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Embedding batcher was closed"))
+
+    @staticmethod
+    async def _embed_one(client: "AsyncAzureOpenAI", model: str, text: str, future: asyncio.Future) -> None:
+        try:
+            response = await client.embeddings.create(model=model, input=[text])
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(response.data[0].embedding)
+
+    async def aclose(self) -> None:
+        """
+        Stop the embedding batcher.
+        Embeddings still waiting for a batch fail with RuntimeError; the next
+        query that needs an embedding starts a new batcher.
+        """
+        task, queue = self._embedding_task, self._embedding_queue
+        self._embedding_task = self._embedding_queue = None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        while queue is not None and not queue.empty():
+            _, future = queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher was closed"))
+
+    def _record_usage(self, result: Union["RunResult", "RunResultStreaming"]) -> None:
+        usage = result.context_wrapper.usage
+        self._usage["prompt"] += usage.input_tokens
+        self._usage["cached"] += usage.input_tokens_details.cached_tokens
+        self._usage["completion"] += usage.output_tokens
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        Get token usage accumulated over all queries.
+        Cached tokens are prompt tokens served from the service's prompt prefix cache.
+
+        Returns:
+            Dictionary with prompt, cached and completion token totals and the cache hit ratio
+        """
+        prompt = self._usage["prompt"]
+        return {
+            **self._usage,
+            "cache_hit_ratio": self._usage["cached"] / prompt if prompt else 0.0,
+        }
+
+    def get_agent_info(self) -> Dict[str, Any]:
+        info = super().get_agent_info()
+        info["model"] = self.model_name
+        info["cache_hit_ratio"] = self.get_usage_stats()["cache_hit_ratio"]
+        return info
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Get response cache statistics.
+
+        Returns:
+            Dictionary with hits, misses and tokens_saved counters, empty if caching is disabled
+        """
+        return self.cache.stats() if self.cache is not None else {}
+
+    async def query_many(self,
+                         messages_list: List[List[Dict[str, str]]],
+                         *,
+                         concurrency: Optional[int] = None,
+                         **kwargs) -> List[Union[str, Dict[str, Any], BaseException]]:
+        """
+        Run several independent queries concurrently on the shared client.
+
+        Args:
+            messages_list: One message list per query
+            concurrency: Maximum number of requests in flight at once, defaults to OPENAI_MAX_CONCURRENCY
+            **kwargs: Additional parameters passed to query
+
+        Returns:
+            Results in the same order as messages_list; a failed query yields
+            its exception instead of aborting the others
+        """
+        semaphore = asyncio.Semaphore(concurrency or int(_getenv("OPENAI_MAX_CONCURRENCY", "16")))
+
+        async def bounded_query(messages: List[Dict[str, str]]):
+            async with semaphore:
+                return await self.query(messages, **kwargs)
+
+        tasks = [bounded_query(messages) for messages in messages_list]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit_batch(self,
+                           messages_list: List[List[Dict[str, str]]],
+                           model: Optional[str] = None,
+                           **kwargs) -> str:
+        """
+        Submit queries to the Batch API for offline processing.
+        Batch jobs are billed at a discount and draw from a separate rate limit pool.
+
+        Args:
+            messages_list: One message list per request; its index becomes the custom_id
+            model: The model deployment to run the batch against, defaults to the agent's model
+            **kwargs: Additional chat completion parameters added to every request
+
+        Returns:
+            The id of the created batch job
+        """
+        lines = []
+        for i, messages in enumerate(messages_list):
+            if self.instructions:
+                messages = [{"role": "system", "content": self.instructions}, *messages]
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {"model": model or self.model_name, "messages": messages, **kwargs},
+            }))
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def await_batch(self,
+                          batch_id: str,
+                          poll_interval: float = 5.0,
+                          max_poll_interval: float = 300.0) -> Dict[str, Any]:
+        """
+        Wait for a batch job to finish and collect its results.
+
+        Args:
+            batch_id: The id returned by submit_batch
+            poll_interval: Initial delay between status checks, doubled after each check
+            max_poll_interval: Upper bound for the delay between status checks
+
+        Returns:
+            Dictionary {custom_id: response} where response is the message content,
+            or the error object for requests that failed
+
+        Raises:
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"Batch '{batch_id}' ended with status '{batch.status}'")
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                else:
+                    results[record["custom_id"]] = record.get("error") or response.get("body")
+        return results
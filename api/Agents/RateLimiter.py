@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """
+    Token bucket limiting the tokens sent to a deployment per minute.
+    Requests wait until the bucket has refilled enough to cover their estimated size.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        """
+        Initialize the limiter with a full bucket.
+
+        Args:
+            tokens_per_minute: Token throughput allowed for the deployment
+        """
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until the given number of tokens can be spent, then spend them.
+
+        Args:
+            tokens: Estimated tokens of the request, capped at the bucket capacity
+        """
+        tokens = min(tokens, self.capacity)
+        # the lock queues waiters so large requests are not starved by small ones
+        async with self._lock:
+            self._refill()
+            while self._available < tokens:
+                await asyncio.sleep((tokens - self._available) / self.rate)
+                self._refill()
+            self._available -= tokens
@@ -0,0 +1,150 @@
+import json
+from hashlib import sha256
+from typing import Dict, List, Any, Optional
+import numpy as np
+
+class SemanticCache:
+    """
+    Response cache for agent queries.
+    Lookups first try an exact match on the full message list, then a semantic
+    match on the embedding of the last user turn.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a semantic hit
+            max_entries: Maximum number of entries kept per lookup kind, oldest are evicted first
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._exact_cache: Dict[bytes, str] = {}
+        # normalized embeddings in one contiguous matrix used as a ring buffer, so a lookup
+        # is a single mat-vec; rows are allocated on the first insert once the dimension is known
+        self._vectors: Optional[np.ndarray] = None
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._contexts: List[Optional[bytes]] = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "cached_tokens": 0}
+
+    @staticmethod
+    def key(messages: List[Dict[str, str]], context: bytes = b"") -> bytes:
+        """
+        Compute the exact-match key for a message list.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            context: Digest of everything else that shapes the response (instructions,
+                tools, generation settings), so different agents never share entries
+        """
+        return sha256(context + json.dumps(messages, sort_keys=True).encode("utf-8")).digest()
+
+    @staticmethod
+    def last_user_turn(messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Return the content of the last user message, if any.
+        """
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return message.get("content")
+        return None
+
+    @staticmethod
+    def semantic_context(messages: List[Dict[str, str]], context: bytes = b"") -> bytes:
+        """
+        Compute the context for a semantic lookup: only the last user turn is embedded,
+        so every other message of the conversation is folded into the context instead.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content' keys
+            context: Context digest as passed to key
+        """
+        end = len(messages)
+        while end and messages[end - 1].get("role") != "user":
+            end -= 1
+        return SemanticCache.key(messages[:end - 1] + messages[end:] if end else messages, context)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get_exact(self, key: bytes, prompt_tokens: int = 0) -> Optional[str]:
+        """
+        Look up a response by exact key.
+
+        Args:
+            key: Key returned by SemanticCache.key
+            prompt_tokens: Prompt size of the query, credited as saved tokens on a hit
+
+        Returns:
+            The cached response or None
+        """
+        response = self._exact_cache.get(key)
+        if response is not None:
+            self._stats["exact_hits"] += 1
+            self._stats["cached_tokens"] += prompt_tokens
+        return response
+
+    def get_semantic(self, embedding: Optional[List[float]], prompt_tokens: int = 0, context: bytes = b"") -> Optional[str]:
+        """
+        Look up the most similar cached response by embedding.
+
+        Args:
+            embedding: Embedding of the last user turn, None counts as a miss
+            prompt_tokens: Prompt size of the query, credited as saved tokens on a hit
+            context: Context digest from semantic_context, only entries stored with it can match
+
+        Returns:
+            The cached response if its similarity reaches the threshold, otherwise None
+        """
+        if embedding is not None and self._size:
+            query = self._normalize(embedding)
+            if query.shape[0] == self._vectors.shape[1]:
+                scores = self._vectors[:self._size] @ query
+                scores[np.fromiter((c != context for c in self._contexts[:self._size]), bool, self._size)] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._stats["semantic_hits"] += 1
+                    self._stats["cached_tokens"] += prompt_tokens
+                    return self._responses[best]
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, key: bytes, embedding: Optional[List[float]], response: str, context: bytes = b"") -> None:
+        """
+        Store a response under its exact key and, if given, its embedding.
+        """
+        self._exact_cache[key] = response
+        if len(self._exact_cache) > self.max_entries:
+            self._exact_cache.pop(next(iter(self._exact_cache)))
+        if embedding is not None:
+            vector = self._normalize(embedding)
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # a different embedding model invalidates the stored vectors
+                self._vectors = np.empty((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._size = self._next = 0
+            self._vectors[self._next] = vector
+            self._responses[self._next] = response
+            self._contexts[self._next] = context
+            self._next = (self._next + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with hits, misses and tokens_saved counters
+        """
+        hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "tokens_saved": self._stats["cached_tokens"],
+            "entries": len(self._exact_cache),
+        }
@@ -1,39 +1,100 @@
-from typing import Optional
+from typing import Dict, Optional
 from contextlib import AsyncExitStack
 from mcp import ClientSession,StdioServerParameters
 from mcp.client.stdio import stdio_client
 import asyncio
+import os
+
+# uvloop cuts per-await scheduling overhead when many servers and queries run concurrently.
+# It supports the subprocess transport used by stdio_client and httpx; it is not available
+# on Windows, where asyncio keeps its default ProactorEventLoop.
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
 
 class MCPClient:
     def __init__(self):
         self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
+        self.sessions: Dict[str, ClientSession] = {}
         self.llm = None
-        self.tools = []
+        self.tools = {}
         self.message = []
+        # each server runs in its own task that owns its transport contexts
+        self._server_tasks: Dict[str, asyncio.Task] = {}
+        self._shutdown = asyncio.Event()
 
-    # connect to MCP server
-    async def connect_to_local_mcp(self, server_script_path: str):
+    @staticmethod
+    def _server_parameters(server_script_path: str) -> StdioServerParameters:
         is_python = server_script_path.endswith('.py')
         is_js = server_script_path.endswith('.js')
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
         command  = "python" if is_python else "node"
-        server_parameters = StdioServerParameters(
+        return StdioServerParameters(
             command=command,
             args=[server_script_path],
             env=None
         )
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_parameters))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
 
-        await self.session.initialize()
+    # connect to MCP server
+    async def connect_to_local_mcp(self, server_script_path: str):
+        server_name = os.path.splitext(os.path.basename(server_script_path))[0]
+        self.session = await self._connect_one(server_name, server_script_path)
+        print("\nConnected to server with tools:", [tool.name for tool in self.tools[server_name]])
+
+    async def connect_many(self, configs: Dict[str, str]) -> Dict[str, ClientSession]:
+        """
+        Connect to several local MCP servers concurrently.
+        Spawn, handshake and tool discovery overlap across servers, so bring-up
+        takes as long as the slowest server rather than the sum of all of them.
+
+        Args:
+            configs: Dictionary {server_name: server_script_path}
+
+        Returns:
+            Dictionary of connected sessions {server_name: session}
+        """
+        await asyncio.gather(*[self._connect_one(name, path) for name, path in configs.items()])
+        if self.session is None and self.sessions:
+            self.session = next(iter(self.sessions.values()))
+        return self.sessions
+
+    async def _connect_one(self, server_name: str, server_script_path: str) -> ClientSession:
+        server_parameters = self._server_parameters(server_script_path)
+        ready = asyncio.get_running_loop().create_future()
+        self._server_tasks[server_name] = asyncio.create_task(self._run_server(server_name, server_parameters, ready))
+        return await ready
+
+    async def _run_server(self, server_name: str, server_parameters: StdioServerParameters, ready: asyncio.Future):
+        # the stdio transport must be entered and exited from the same task
+        async with AsyncExitStack() as exit_stack:
+            try:
+                stdio, write = await exit_stack.enter_async_context(stdio_client(server_parameters))
+                session = await exit_stack.enter_async_context(ClientSession(stdio, write))
+                await session.initialize()
+                # list available tools
+                response = await session.list_tools()
+            except Exception as e:
+                ready.set_exception(e)
+                return
+            self.sessions[server_name] = session
+            self.tools[server_name] = response.tools
+            ready.set_result(session)
+            await self._shutdown.wait()
+
+    async def cleanup(self):
+        """
+        Close every server connection.
+        """
+        self._shutdown.set()
+        await asyncio.gather(*self._server_tasks.values(), return_exceptions=True)
+        self._server_tasks.clear()
+        self.sessions.clear()
+        self.session = None
+        self._shutdown = asyncio.Event()
 
-        # list available tools
-        response = await self.session.list_tools()
-        tools = response.tools
-        print("\nConnected to server with tools:", [tool.name for tool in tools])
     # Call tools from the MCP server
     # get MCP tool
     # process a query